@@ -11,11 +11,14 @@ Run with:
     streamlit run app.py
 """
 
+import shutil
 import sys
+import threading
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
 import streamlit as st
+from streamlit.runtime.uploaded_file_manager import UploadedFile
 
 st.set_page_config(page_title="Azure RAG System", page_icon="🔍", layout="wide")
 
@@ -27,6 +30,54 @@ def get_pipeline():
     return RAGPipeline(top_k=5)
 
 
+# Warm the pipeline in the background so the 1-3 s of openai/azure-sdk
+# imports overlaps with the first page render instead of blocking it.
+# main()'s get_pipeline() call then hits the already-filled
+# st.cache_resource entry (its internal lock handles the race).
+threading.Thread(target=get_pipeline, daemon=True).start()
+
+
+@st.cache_data(ttl=30)
+def get_cached_stats(_pipeline):
+    """
+    Pipeline stats, cached for 30 seconds.
+
+    Streamlit reruns the whole script on every widget click — without
+    this cache each click would hit Azure for the same numbers.
+    (The underscore on _pipeline tells Streamlit not to hash it.)
+    """
+    return _pipeline.stats()
+
+
+@st.cache_data(hash_funcs={UploadedFile: lambda f: (f.file_id, f.size)})
+def ingest_uploaded_files(files, _pipeline) -> int:
+    """
+    Write uploaded files to a temp dir and ingest them.
+
+    Cached by each upload's (file_id, size) instead of its contents —
+    Streamlit would otherwise hash every byte of every file on each
+    rerun just to decide whether anything changed. Re-clicking Ingest
+    with the same uploads is then a no-op.
+    """
+    temp_dir = Path("./data/uploads")
+    temp_dir.mkdir(parents=True, exist_ok=True)
+
+    try:
+        for f in files:
+            temp_path = temp_dir / f.name
+            # Stream to disk in 1 MB pieces instead of f.read() —
+            # memory stays constant even for huge PDFs
+            f.seek(0)
+            with open(temp_path, "wb") as out:
+                shutil.copyfileobj(f, out, length=1024 * 1024)
+
+        return _pipeline.ingest(temp_dir, upload_to_blob=True)
+    finally:
+        # Cleanup
+        for f in temp_dir.iterdir():
+            f.unlink()
+
+
 def main():
     st.title("🔍 Azure AI RAG System")
     st.caption("Ask questions about your documents using Azure OpenAI + AI Search")
@@ -38,7 +89,7 @@ def main():
         st.header("⚙️ Controls")
         
         try:
-            stats = pipeline.stats()
+            stats = get_cached_stats(pipeline)
             st.metric("Indexed Documents", stats["document_count"])
             st.caption(f"Model: {stats['chat_model']}")
             st.caption(f"Index: {stats['index_name']}")
@@ -46,12 +97,21 @@ def main():
             st.error(f"Connection error: {e}")
         
         st.divider()
-        
+
+        # Shorter answers = faster + cheaper (latency scales with tokens)
+        pipeline.max_tokens = st.slider(
+            "Max answer tokens", min_value=64, max_value=1024,
+            value=384, step=64,
+        )
+
+        st.divider()
+
         # Setup button
         if st.button("🔧 Setup Index"):
             with st.spinner("Creating index..."):
                 try:
                     pipeline.setup()
+                    get_cached_stats.clear()  # index changed
                     st.success("Index created!")
                 except Exception as e:
                     st.error(f"Error: {e}")
@@ -65,23 +125,13 @@ def main():
         )
         
         if uploaded_files and st.button("📤 Ingest Files"):
-            temp_dir = Path("./data/uploads")
-            temp_dir.mkdir(parents=True, exist_ok=True)
-            
-            for f in uploaded_files:
-                temp_path = temp_dir / f.name
-                temp_path.write_bytes(f.read())
-            
             with st.spinner("Processing..."):
                 try:
-                    count = pipeline.ingest(temp_dir, upload_to_blob=True)
+                    count = ingest_uploaded_files(uploaded_files, pipeline)
+                    get_cached_stats.clear()  # document count changed
                     st.success(f"Ingested {count} chunks!")
                 except Exception as e:
                     st.error(f"Error: {e}")
-            
-            # Cleanup
-            for f in temp_dir.iterdir():
-                f.unlink()
         
         # Quick ingest sample docs
         if st.button("📝 Load Sample Docs"):
@@ -90,6 +140,7 @@ def main():
             with st.spinner("Ingesting sample docs..."):
                 try:
                     count = pipeline.ingest(docs_dir)
+                    get_cached_stats.clear()  # document count changed
                     st.success(f"Ingested {count} chunks!")
                 except Exception as e:
                     st.error(f"Error: {e}")
@@ -105,23 +156,24 @@ def main():
             top_k = st.number_input("Sources", 1, 10, 5)
         
         if st.button("Ask", type="primary", disabled=not question):
-            with st.spinner("Thinking..."):
-                try:
-                    result = pipeline.query(question, top_k=top_k)
-                    
-                    st.markdown("### Answer")
-                    st.markdown(result.answer)
-                    
-                    with st.expander(f"📚 Sources ({len(result.sources)})"):
-                        for i, src in enumerate(result.sources, 1):
-                            score = src.get('score', 0)
-                            source = src.get('source', 'unknown')
-                            st.markdown(f"**{i}. {source}** (score: {score:.3f})")
-                            st.text(src['content'][:300] + "...")
-                            st.divider()
-                            
-                except Exception as e:
-                    st.error(f"Error: {e}")
+            try:
+                st.markdown("### Answer")
+                # Stream tokens as they arrive — the first words show
+                # up in ~200 ms instead of waiting seconds for the
+                # full answer
+                st.write_stream(pipeline.query_stream(question, top_k=top_k))
+
+                sources = pipeline.last_sources
+                with st.expander(f"📚 Sources ({len(sources)})"):
+                    for i, src in enumerate(sources, 1):
+                        score = src.get('score', 0)
+                        source = src.get('source', 'unknown')
+                        st.markdown(f"**{i}. {source}** (score: {score:.3f})")
+                        st.text(src['content'][:300] + "...")
+                        st.divider()
+
+            except Exception as e:
+                st.error(f"Error: {e}")
     
     with tab2:
         search_query = st.text_input("Search query:")
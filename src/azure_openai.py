@@ -17,96 +17,547 @@ HOW AZURE OPENAI DIFFERS FROM REGULAR OPENAI:
   regional deployment, and content filtering.
 """
 
-from openai import AzureOpenAI
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator
+
+import httpx
+import numpy as np
+from openai import AsyncAzureOpenAI, AzureOpenAI
+from src import embedding_cache
 from src.config import config
 
 
+# The client is created once and reused for every request.
+# Rebuilding it per call would re-read config and open a fresh
+# HTTP connection pool each time — wasted work.
+_client: AzureOpenAI | None = None
+
+
 def get_openai_client() -> AzureOpenAI:
     """
-    Create a connection to Azure OpenAI.
-    
+    Get the shared connection to Azure OpenAI.
+
     This client object handles authentication and API calls.
-    You create it once, then use it for all requests.
+    It's created lazily on first use, then reused for all requests
+    so the underlying HTTP connections stay warm.
     """
-    client = AzureOpenAI(
-        azure_endpoint=config.openai.endpoint,
-        api_key=config.openai.key,
-        api_version=config.openai.api_version,
-    )
-    return client
+    global _client
+
+    if _client is None:
+        _client = AzureOpenAI(
+            azure_endpoint=config.openai.endpoint,
+            api_key=config.openai.key,
+            api_version=config.openai.api_version,
+            # Retry 429/5xx up to 5 times with exponential backoff
+            # (the SDK honors Retry-After headers) — a transient rate
+            # limit shouldn't abort a multi-hour indexing run. The
+            # default is only 2 attempts.
+            max_retries=5,
+            # Keep-alive connection pool: embeddings + chat calls reuse
+            # warm TLS connections instead of re-handshaking each time.
+            http_client=httpx.Client(
+                limits=httpx.Limits(
+                    max_keepalive_connections=32,
+                    max_connections=64,
+                ),
+                timeout=30.0,
+            ),
+        )
+
+    return _client
+
+
+def _unit(vec: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize a vector in place.
+
+    text-embedding-3 outputs are not unit-norm. Normalizing once here
+    lets the search index use the dot-product metric, which skips the
+    sqrt/divide cosine would otherwise pay inside every HNSW distance
+    evaluation. Cosine similarity of the originals equals the dot
+    product of the normalized vectors, so scores are unchanged.
+    """
+    norm = float(np.linalg.norm(vec))
+    if norm:
+        vec /= norm
+    return vec
 
 
-def get_embedding(text: str) -> list[float]:
+# Async twin of _client, for event-loop callers (see below)
+_async_client: AsyncAzureOpenAI | None = None
+
+
+def get_async_openai_client() -> AsyncAzureOpenAI:
+    """
+    Get the shared async connection to Azure OpenAI.
+
+    Same singleton pattern as get_openai_client(): one client, one
+    warm connection pool, reused by every coroutine.
+    """
+    global _async_client
+
+    if _async_client is None:
+        _async_client = AsyncAzureOpenAI(
+            azure_endpoint=config.openai.endpoint,
+            api_key=config.openai.key,
+            api_version=config.openai.api_version,
+            max_retries=5,  # exponential backoff on 429s
+        )
+
+    return _async_client
+
+
+def get_embedding(text: str) -> np.ndarray:
     """
     Convert a single text into an embedding vector.
-    
+
     WHAT HAPPENS:
     1. We send the text to Azure OpenAI's embedding model
     2. The model reads the text and understands its meaning
-    3. It returns a list of 1536 numbers (the embedding)
+    3. It returns 1536 numbers (the embedding)
     4. Similar texts will have similar numbers
-    
+
+    We return a numpy float32 array, not a Python list: it's ~8x
+    smaller in memory (no per-float objects) and dot products /
+    cosine similarities run as single vectorized calls.
+
     Args:
         text: Any string (sentence, paragraph, document chunk)
-        
+
     Returns:
-        A list of 1536 floats (the embedding vector)
-        
+        A float32 numpy array of 1536 numbers (the embedding vector)
+
     Example:
         vec = get_embedding("machine learning is AI")
-        # vec = [0.023, -0.045, 0.012, ...]  (1536 numbers)
+        # vec = array([0.023, -0.045, 0.012, ...], dtype=float32)
     """
+    # Same persistent cache the batch path uses: a text embedded
+    # during ingest (or a repeated query) never hits the API again,
+    # even across process restarts.
+    key = embedding_cache.text_key(text, _cache_tag())
+    cached = embedding_cache.get_many([key])
+    if key in cached:
+        return cached[key]
+
     client = get_openai_client()
-    
+
     response = client.embeddings.create(
         input=text,
         model=config.openai.embedding_deployment,  # "text-embedding-3-small"
+        dimensions=config.openai.embedding_dim,
     )
-    
+
     # The response contains the embedding in response.data[0].embedding
-    return response.data[0].embedding
+    vec = _unit(np.asarray(response.data[0].embedding, dtype=np.float32))
+    embedding_cache.put_many({key: vec})
+    return vec
+
+
+async def get_embedding_async(text: str) -> np.ndarray:
+    """
+    Async version of get_embedding.
+
+    Identical semantics (persistent cache, normalization) but awaits
+    the API call instead of blocking, so hundreds of concurrent
+    queries can share one event loop instead of one thread each.
+    """
+    key = embedding_cache.text_key(text, _cache_tag())
+    cached = embedding_cache.get_many([key])
+    if key in cached:
+        return cached[key]
 
+    client = get_async_openai_client()
 
-def get_embeddings_batch(texts: list[str]) -> list[list[float]]:
+    response = await client.embeddings.create(
+        input=text,
+        model=config.openai.embedding_deployment,
+        dimensions=config.openai.embedding_dim,
+    )
+
+    vec = _unit(np.asarray(response.data[0].embedding, dtype=np.float32))
+    embedding_cache.put_many({key: vec})
+    return vec
+
+
+def _cache_tag() -> str:
+    """
+    Namespace for embedding-cache keys: model + requested dimensions.
+
+    Including the dimension means switching AZURE_OPENAI_EMBEDDING_DIM
+    never serves vectors of the wrong size from the cache. The "unit"
+    marker invalidates entries written before vectors were
+    L2-normalized at this layer.
+    """
+    return f"{config.openai.embedding_deployment}#{config.openai.embedding_dim}#unit"
+
+
+def get_embedding_i8(text: str) -> tuple[bytes, float]:
+    """
+    Get an embedding quantized to int8 (plus its scale factor).
+
+    Use this when storing or shipping lots of vectors: int8 is 4x
+    smaller than float32. Reconstruct with embedding_cache.dequantize().
+    """
+    return embedding_cache.quantize(get_embedding(text))
+
+
+# How many texts to send per embeddings request.
+# Azure text-embedding-3 accepts up to 2048 inputs per call, so the
+# old "batches of 16" left a ~16x speedup on the table for big ingests
+# (this is a network-bound workload — round-trips dominate).
+_BATCH_SIZE = int(os.getenv("AZURE_EMBEDDING_BATCH_SIZE", "256"))
+
+# Total tokens per request. Each individual input is capped at ~8191
+# tokens, but the request as a whole allows far more — packing close
+# to the real limit means fewer round-trips per ingest.
+_BATCH_TOKEN_BUDGET = 250_000
+
+# tiktoken encoder, loaded lazily (it downloads/caches a vocab file)
+_encoding = None
+
+
+def _count_tokens(text: str) -> int:
+    """Count tokens the way the embedding model does."""
+    global _encoding
+
+    if _encoding is None:
+        import tiktoken
+        # cl100k_base is the encoding behind the text-embedding-3
+        # family — requested directly, skipping the model-name lookup
+        _encoding = tiktoken.get_encoding("cl100k_base")
+
+    return len(_encoding.encode(text))
+
+
+def _build_batches(texts: list[str]) -> list[list[int]]:
+    """
+    Pack texts into batches for the embeddings API, by token count.
+
+    Returns batches of INDICES into texts, not the texts themselves —
+    batches are packed longest-text-first (smart batching), so
+    callers scatter results back to input order via the indices.
+
+    Sorting by length first makes the greedy packing tight: mixing a
+    few 8000-token chunks into batches of 50-token chunks no longer
+    closes a nearly-empty batch early. A batch is closed when it
+    hits either limit:
+    - _BATCH_SIZE texts (API accepts up to 2048)
+    - _BATCH_TOKEN_BUDGET tokens total
+    """
+    # Tokenize each text exactly once; sort and pack reuse the counts
+    counts = [_count_tokens(t) for t in texts]
+    order = sorted(range(len(texts)), key=counts.__getitem__, reverse=True)
+
+    batches = []
+    batch: list[int] = []
+    batch_tokens = 0
+
+    for i in order:
+        tokens = counts[i]
+
+        if batch and (len(batch) >= _BATCH_SIZE or batch_tokens + tokens > _BATCH_TOKEN_BUDGET):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+
+        batch.append(i)
+        batch_tokens += tokens
+
+    if batch:
+        batches.append(batch)
+
+    return batches
+
+
+def get_embeddings_batch(texts: list[str]) -> list[np.ndarray]:
     """
     Convert multiple texts into embeddings at once (faster than one by one).
-    
-    Azure OpenAI can process up to 16 texts in a single API call.
-    We batch them for efficiency.
-    
+
+    Texts are packed into large batches (count- and token-limited) so a
+    whole ingest takes a handful of HTTP calls instead of hundreds.
+
+    Previously-seen texts are served from the on-disk cache
+    (src/embedding_cache.py), so re-ingesting unchanged documents
+    costs zero API calls.
+
     Args:
         texts: List of strings
-        
+
     Returns:
-        List of embedding vectors (same order as input)
+        List of float32 numpy vectors (same order as input)
     """
+    model = config.openai.embedding_deployment
+
+    # Step 1: Check the persistent cache for all texts in one lookup
+    keys = [embedding_cache.text_key(t, _cache_tag()) for t in texts]
+    vectors = embedding_cache.get_many(keys)
+
+    # Step 2: Collect UNIQUE misses. Real corpora repeat chunks
+    # (boilerplate headers, footers, tables) — embedding each distinct
+    # text once cuts API cost by the duplicate ratio.
+    misses: dict[bytes, str] = {}
+    for text, key in zip(texts, keys):
+        if key not in vectors:
+            misses.setdefault(key, text)
+
+    # Step 3: Embed the misses and write them back to the cache
+    if misses:
+        client = get_openai_client()
+        miss_texts = list(misses.values())
+
+        def embed_one(index_batch: list[int]) -> list[np.ndarray]:
+            response = client.embeddings.create(
+                input=[miss_texts[i] for i in index_batch],
+                model=model,
+                dimensions=config.openai.embedding_dim,
+            )
+            return [
+                _unit(np.asarray(d.embedding, dtype=np.float32))
+                for d in response.data
+            ]
+
+        # Batches are packed by token count (longest texts first);
+        # each batch carries indices, so results scatter back into
+        # miss order below regardless of packing
+        batches = _build_batches(miss_texts)
+
+        fresh: list[np.ndarray | None] = [None] * len(miss_texts)
+        if len(batches) == 1:
+            # One request — a pool would only add thread overhead
+            batch_results = [embed_one(batches[0])]
+        else:
+            # Each request is a blocking network round-trip, so up to
+            # 5 in flight at once cuts wall time almost linearly. The
+            # shared client is thread-safe, map() keeps input order,
+            # and 5 workers stays under typical Azure rate limits.
+            with ThreadPoolExecutor(max_workers=5) as pool:
+                batch_results = list(pool.map(embed_one, batches))
+
+        for index_batch, batch_vecs in zip(batches, batch_results):
+            for i, vec in zip(index_batch, batch_vecs):
+                fresh[i] = vec
+
+        new_entries = dict(zip(misses, fresh))
+        embedding_cache.put_many(new_entries)
+        vectors.update(new_entries)
+
+    # Step 4: Scatter back into input order (duplicates share a vector)
+    return [vectors[key] for key in keys]
+
+
+def embed_stream(
+    texts: Iterable[str],
+    batch_size: int | None = None,
+) -> Iterator[tuple[str, np.ndarray]]:
+    """
+    Embed a stream of texts lazily, yielding (text, vector) pairs.
+
+    Unlike get_embeddings_batch(), this never materializes the whole
+    corpus: it pulls batch_size texts at a time from the iterator,
+    embeds them (cache + dedup included), and yields results as they
+    arrive. That lets a caller start uploading early chunks to the
+    search index while later chunks are still being embedded —
+    overlapping two network-bound stages.
+
+    Args:
+        texts: Any iterable of strings (list, generator, ...)
+        batch_size: Texts pulled per round (default: the env-tuned
+            embedding batch size)
+
+    Yields:
+        (text, embedding) tuples in input order
+    """
+    if batch_size is None:
+        batch_size = _BATCH_SIZE
+
+    iterator = iter(texts)
+
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            break
+
+        for pair in zip(batch, get_embeddings_batch(batch)):
+            yield pair
+
+
+def submit_embedding_batch(texts: list[str]) -> str:
+    """
+    Submit texts to the Batch API instead of embedding them live.
+
+    The Batch API trades latency for cost: results arrive within 24 h
+    at half the price of synchronous calls. That's a great fit for
+    one-shot bulk ingests where nobody is waiting at a prompt.
+
+    HOW IT WORKS:
+    1. We write one JSONL line per text (a stored embeddings request)
+    2. Upload that file with purpose="batch"
+    3. Create a batch job pointing at the file
+    4. Later, collect_embedding_batch() picks up the results
+
+    Args:
+        texts: List of strings to embed
+
+    Returns:
+        The batch job id (pass it to collect_embedding_batch)
+    """
+    import io
+    import json
+
     client = get_openai_client()
-    
-    all_embeddings = []
-    
-    # Process in batches of 16 (Azure limit)
-    batch_size = 16
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i:i + batch_size]
-        
-        response = client.embeddings.create(
-            input=batch,
-            model=config.openai.embedding_deployment,
-        )
-        
-        # Extract embeddings in order
-        for item in response.data:
-            all_embeddings.append(item.embedding)
-    
+    model = config.openai.embedding_deployment
+
+    # One request per line; custom_id ties results back to inputs
+    lines = [
+        json.dumps({
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/v1/embeddings",
+            "body": {
+                "model": model,
+                "input": text,
+                "dimensions": config.openai.embedding_dim,
+            },
+        })
+        for i, text in enumerate(texts)
+    ]
+    payload = io.BytesIO("\n".join(lines).encode("utf-8"))
+
+    # The Batch API requires a .jsonl input file; a bare BytesIO has
+    # no name and would be uploaded as a generic octet-stream, which
+    # the API rejects — so pass an explicit (filename, data) pair
+    batch_file = client.files.create(
+        file=("embeddings.jsonl", payload),
+        purpose="batch",
+    )
+
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/embeddings",
+        completion_window="24h",
+    )
+
+    print(f"📨 Submitted embedding batch {batch.id} ({len(texts)} texts)")
+    return batch.id
+
+
+def collect_embedding_batch(batch_id: str, texts: list[str]) -> list[np.ndarray] | None:
+    """
+    Fetch the results of a submitted embedding batch.
+
+    Returns None while the job is still running. Once complete, the
+    vectors are also written to the on-disk embedding cache, so a
+    normal ingest of the same texts afterwards makes zero API calls.
+
+    Args:
+        batch_id: Id returned by submit_embedding_batch
+        texts: The same texts, in the same order, as the submission
+
+    Returns:
+        List of float32 vectors in input order, or None if not ready
+    """
+    import json
+
+    client = get_openai_client()
+    batch = client.batches.retrieve(batch_id)
+
+    if batch.status in ("validating", "in_progress", "finalizing"):
+        return None
+    if batch.status != "completed":
+        raise RuntimeError(f"Embedding batch {batch_id} ended as: {batch.status}")
+
+    raw = client.files.content(batch.output_file_id).text
+
+    # Results can arrive in any order — custom_id maps them back
+    vectors: list = [None] * len(texts)
+    for line in raw.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        index = int(record["custom_id"])
+        embedding = record["response"]["body"]["data"][0]["embedding"]
+        vectors[index] = _unit(np.asarray(embedding, dtype=np.float32))
+
+    # Warm the persistent cache so follow-up ingests are free
+    embedding_cache.put_many({
+        embedding_cache.text_key(text, _cache_tag()): vec
+        for text, vec in zip(texts, vectors)
+        if vec is not None
+    })
+
+    return vectors
+
+
+async def get_embeddings_batch_async(
+    texts: list[str],
+    concurrency: int = 8,
+) -> list[np.ndarray]:
+    """
+    Async version of get_embeddings_batch: fire several batches at once.
+
+    Even with large batches, a big ingest is a chain of round-trips if
+    we wait for each response before sending the next request. This is
+    pure network I/O, so running batches concurrently scales almost
+    linearly until Azure's rate limits kick in.
+
+    The semaphore caps in-flight requests; the SDK's built-in retry
+    (max_retries) handles 429 rate limiting with exponential backoff.
+
+    Args:
+        texts: List of strings
+        concurrency: Max number of requests in flight at once
+
+    Returns:
+        List of embedding vectors (same order as input)
+    """
+    client = get_async_openai_client()
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def embed(index_batch: list[int]) -> list[np.ndarray]:
+        async with semaphore:
+            response = await client.embeddings.create(
+                input=[texts[i] for i in index_batch],
+                model=config.openai.embedding_deployment,
+                dimensions=config.openai.embedding_dim,
+            )
+            return [
+                _unit(np.asarray(d.embedding, dtype=np.float32))
+                for d in response.data
+            ]
+
+    batches = _build_batches(texts)
+    results = await asyncio.gather(*[embed(batch) for batch in batches])
+
+    # Batches are token-packed (longest first), so scatter each
+    # batch's vectors back to the original text positions
+    all_embeddings: list = [None] * len(texts)
+    for index_batch, batch_embeddings in zip(batches, results):
+        for i, vec in zip(index_batch, batch_embeddings):
+            all_embeddings[i] = vec
+
     return all_embeddings
 
 
+# RAG answers are typically 100-300 tokens; capping generation length
+# directly caps the dominant part of wall-clock latency (and cost),
+# since generation time scales linearly with tokens produced.
+DEFAULT_MAX_TOKENS = 384
+
+# Stop generating if the model starts echoing the prompt scaffolding
+DEFAULT_STOP = ["\n\n---", "Question:"]
+
+
 def chat_completion(
     question: str,
     context: str,
     system_prompt: str | None = None,
     temperature: float = 0.1,
-    max_tokens: int = 1024,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    stop: list[str] | None = None,
 ) -> str:
     """
     Generate an answer using GPT-4o-mini with context.
@@ -125,7 +576,8 @@ def chat_completion(
         system_prompt: Instructions for GPT
         temperature: Creativity (0 = factual, 1 = creative)
         max_tokens: Maximum length of answer
-        
+        stop: Sequences that end generation early
+
     Returns:
         The generated answer as a string
     """
@@ -159,8 +611,9 @@ Answer:"""
         ],
         temperature=temperature,
         max_tokens=max_tokens,
+        stop=stop if stop is not None else DEFAULT_STOP,
     )
-    
+
     # Extract the answer
     # response.choices[0] = the first (and only) response
     # .message.content = the actual text
@@ -171,6 +624,7 @@ def chat_completion_stream(
     question: str,
     context: str,
     system_prompt: str | None = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
 ):
     """
     Same as chat_completion but streams tokens one by one.
@@ -204,7 +658,8 @@ Answer:"""
             {"role": "user", "content": user_message},
         ],
         temperature=0.1,
-        max_tokens=1024,
+        max_tokens=max_tokens,
+        stop=DEFAULT_STOP,
         stream=True,  # ← This is the key difference
     )
     
@@ -15,34 +15,62 @@ WHAT THIS MODULE DOES:
 4. upload_directory() - Uploads an entire folder
 """
 
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from azure.storage.blob import BlobServiceClient, ContainerClient
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+from azure.storage.blob import BlobServiceClient, ContainerClient, ContentSettings
 from src.config import config
 
 
+# Shared container client. Creating one per operation would rebuild
+# the HTTP pipeline and re-run the exists() check on every upload.
+# upload_directory's worker threads all call get_container_client(),
+# so first-time setup is guarded by a lock — otherwise several
+# workers would race to create the container.
+_container: ContainerClient | None = None
+_container_lock = threading.Lock()
+
+
 def get_container_client() -> ContainerClient:
     """
     Connect to your Azure Blob container.
-    
+
     Think of this as "plugging in the USB drive."
-    Returns a client object you use for all operations.
+    The connection is made once and reused, so repeated uploads share
+    one warm connection pool and skip the exists() round-trip.
     """
-    # BlobServiceClient = connection to the storage account
-    blob_service = BlobServiceClient.from_connection_string(
-        config.storage.connection_string
-    )
-    
-    # ContainerClient = connection to a specific container (folder)
-    container = blob_service.get_container_client(
-        config.storage.container_name
-    )
-    
-    # Create the container if it doesn't exist
-    if not container.exists():
-        container.create_container()
-        print(f"📁 Created container: {config.storage.container_name}")
-    
-    return container
+    global _container
+
+    with _container_lock:
+        if _container is None:
+            # BlobServiceClient = connection to the storage account
+            # max_block_size: large files are uploaded in 8 MB blocks
+            # (bigger blocks = fewer round-trips per file)
+            blob_service = BlobServiceClient.from_connection_string(
+                config.storage.connection_string,
+                max_block_size=8 * 1024 * 1024,
+            )
+
+            # ContainerClient = connection to a specific container (folder)
+            container = blob_service.get_container_client(
+                config.storage.container_name
+            )
+
+            # Create the container if it doesn't exist. Another
+            # process may still beat us to it between the two calls,
+            # so "already exists" is treated as success.
+            if not container.exists():
+                try:
+                    container.create_container()
+                    print(f"📁 Created container: {config.storage.container_name}")
+                except ResourceExistsError:
+                    pass
+
+            _container = container
+
+    return _container
 
 
 def upload_file(local_path: str | Path, blob_name: str | None = None) -> str:
@@ -70,42 +98,82 @@ def upload_file(local_path: str | Path, blob_name: str | None = None) -> str:
         blob_name = local_path.name
     
     container = get_container_client()
-    
+
+    # Hash the file (streamed, so large files don't load into RAM).
+    # Azure stores this hash with the blob, which lets us skip
+    # uploads when nothing changed — re-running ingest on the same
+    # documents then costs one HEAD request per file, not gigabytes.
+    with open(local_path, "rb") as f:
+        md5 = hashlib.file_digest(f, "md5").digest()
+
+    try:
+        props = container.get_blob_client(blob_name).get_blob_properties()
+        if props.content_settings.content_md5 == md5:
+            print(f"⏭️ Unchanged, skipping: {local_path.name}")
+            return blob_name
+    except ResourceNotFoundError:
+        pass  # New blob — upload it
+
     # Upload the file
     # open in binary mode ("rb" = read bytes)
+    # Passing length= lets the SDK pick the fast path: small files go
+    # up as a single Put Blob call instead of the staged
+    # Put Block / Put Block List dance (2 extra round-trips each).
+    # For large files, max_concurrency=4 uploads blocks in parallel.
+    size = local_path.stat().st_size
     with open(local_path, "rb") as data:
         container.upload_blob(
             name=blob_name,
             data=data,
             overwrite=True,  # Replace if already exists
+            length=size,
+            max_concurrency=1 if size < 8 * 1024 * 1024 else 4,
+            content_settings=ContentSettings(content_md5=md5),
         )
-    
+
     print(f"✅ Uploaded: {local_path.name} → {blob_name}")
     return blob_name
 
 
+# File types we know how to process downstream
+SUPPORTED_SUFFIXES = frozenset({".pdf", ".txt", ".md", ".docx", ".markdown"})
+
+
 def upload_directory(local_dir: str | Path) -> list[str]:
     """
-    Upload all supported files from a directory.
-    
+    Upload all supported files from a directory (recursively).
+
     Supported: .pdf, .txt, .md, .docx
-    
+
     Returns:
         List of uploaded blob names
     """
     local_dir = Path(local_dir)
-    
+
     if not local_dir.is_dir():
         raise ValueError(f"Not a directory: {local_dir}")
-    
-    supported = {".pdf", ".txt", ".md", ".docx", ".markdown"}
-    uploaded = []
-    
-    for file_path in local_dir.iterdir():
-        if file_path.suffix.lower() in supported:
-            blob_name = upload_file(file_path)
-            uploaded.append(blob_name)
-    
+
+    # Lazy recursive walk: rglob yields files as it finds them, so
+    # uploads start immediately instead of waiting for a full listing
+    # of a large tree
+    paths = (
+        p for p in local_dir.rglob("*")
+        if p.is_file() and p.suffix.lower() in SUPPORTED_SUFFIXES
+    )
+
+    def upload_one(path: Path) -> str:
+        # Blob names keep the path relative to the directory root, so
+        # same-named files in different subdirectories (2023/report.pdf
+        # vs 2024/report.pdf) stay distinct blobs instead of silently
+        # overwriting each other
+        return upload_file(path, path.relative_to(local_dir).as_posix())
+
+    # Upload files in parallel — each upload is a blocking network
+    # call, so N files at a time cuts wall time by ~N on fast links.
+    # Enumeration and uploads overlap because paths is a generator.
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        uploaded = list(executor.map(upload_one, paths))
+
     print(f"\n📊 Uploaded {len(uploaded)} files total")
     return uploaded
 
@@ -147,10 +215,13 @@ def download_file(blob_name: str, local_path: str | Path) -> Path:
     container = get_container_client()
     
     blob_client = container.get_blob_client(blob_name)
-    
+
+    # Stream straight into the file instead of readall() —
+    # readall() would hold the whole blob in memory first.
+    # max_concurrency=4 downloads block ranges in parallel.
     with open(local_path, "wb") as f:
-        data = blob_client.download_blob()
-        f.write(data.readall())
+        stream = blob_client.download_blob(max_concurrency=4)
+        stream.readinto(f)
     
     print(f"✅ Downloaded: {blob_name} → {local_path}")
     return local_path
@@ -9,110 +9,211 @@ WHY A SEPARATE CONFIG FILE?
 - One place to change all settings
 
 HOW IT WORKS:
-1. Reads .env file (python-dotenv library)
-2. Creates dataclass objects with typed fields
+1. Reads .env file ONCE into a snapshot dict (python-dotenv library)
+2. Builds frozen dataclass objects with typed fields from that snapshot
 3. Other modules import config and use the values
+
+The snapshot is cached, so the environment is only walked a single
+time per process no matter how often configs are built or validated.
+Real environment variables still win over .env values.
 """
 
+import functools
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from dotenv import load_dotenv
+from typing import Mapping
+
+from dotenv import dotenv_values
 
 
-# Load .env file from project root
-# This reads the file and puts values into os.environ
+# Location of the .env file in the project root
 env_path = Path(__file__).parent.parent / ".env"
-load_dotenv(env_path)
 
 
-@dataclass
+@functools.lru_cache(maxsize=1)
+def _env() -> Mapping[str, str]:
+    """
+    One-time snapshot of the environment.
+
+    .env values first, overridden by the real process environment —
+    read exactly once and reused for every config field below.
+    """
+    return {**dotenv_values(env_path), **os.environ}
+
+
+def _get(name: str, default: str = "") -> str:
+    """Read one setting from the cached snapshot."""
+    value = _env().get(name)
+    return value if value is not None else default
+
+
+@dataclass(frozen=True, slots=True)
 class AzureOpenAIConfig:
     """
     Settings for Azure OpenAI Service.
-    
+
     endpoint: The URL of your Azure OpenAI resource
     key: Your API key (like a password)
     api_version: Which version of the API to use
     chat_deployment: Name of your GPT model deployment
     embedding_deployment: Name of your embedding model deployment
+    embedding_dim: Vector size to request (text-embedding-3 models can
+        truncate to e.g. 512 or 256 — smaller vectors mean a smaller
+        index and faster search, at a minor recall cost)
     """
-    endpoint: str = os.getenv("AZURE_OPENAI_ENDPOINT", "")
-    key: str = os.getenv("AZURE_OPENAI_KEY", "")
-    api_version: str = os.getenv("AZURE_OPENAI_API_VERSION", "2024-06-01")
-    chat_deployment: str = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT", "gpt-4o-mini")
-    embedding_deployment: str = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-small")
-
-
-@dataclass
+    endpoint: str
+    key: str
+    api_version: str
+    chat_deployment: str
+    embedding_deployment: str
+    embedding_dim: int
+
+    @classmethod
+    def from_env(cls) -> "AzureOpenAIConfig":
+        return cls(
+            endpoint=_get("AZURE_OPENAI_ENDPOINT"),
+            key=_get("AZURE_OPENAI_KEY"),
+            api_version=_get("AZURE_OPENAI_API_VERSION", "2024-06-01"),
+            chat_deployment=_get("AZURE_OPENAI_CHAT_DEPLOYMENT", "gpt-4o-mini"),
+            embedding_deployment=_get(
+                "AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-3-small"
+            ),
+            embedding_dim=int(_get("AZURE_OPENAI_EMBEDDING_DIM", "1536")),
+        )
+
+
+@dataclass(frozen=True, slots=True)
 class AzureSearchConfig:
     """
     Settings for Azure AI Search.
-    
+
     endpoint: URL of your search service
     key: Admin key for creating/managing indexes
-    index_name: Name of the search index
+    index_name: Name of the default search index
+    index_map: Optional routing table of (source-prefix, index-name)
+        pairs. Documents whose source matches a prefix land in that
+        index instead of the default one. Several small HNSW graphs
+        have shorter traversal paths than one big graph, and
+        independent indexes can be searched in parallel. Empty by
+        default — single-index behavior is unchanged.
+    hnsw_m: Neighbors per HNSW graph node (more = better recall,
+        bigger index)
+    hnsw_ef_construction: Candidate-list size while building the
+        graph (build cost scales linearly with this)
+    hnsw_ef_search: Candidate-list size while searching (query
+        latency scales with this)
     """
-    endpoint: str = os.getenv("AZURE_SEARCH_ENDPOINT", "")
-    key: str = os.getenv("AZURE_SEARCH_KEY", "")
-    index_name: str = os.getenv("AZURE_SEARCH_INDEX", "rag-index")
-
-
-@dataclass 
+    endpoint: str
+    key: str
+    index_name: str
+    index_map: tuple[tuple[str, str], ...]
+    hnsw_m: int
+    hnsw_ef_construction: int
+    hnsw_ef_search: int
+
+    @classmethod
+    def from_env(cls) -> "AzureSearchConfig":
+        # AZURE_SEARCH_INDEX_MAP format: "prefix:index,prefix:index"
+        # e.g. "manuals:rag-manuals,reports:rag-reports"
+        raw_map = _get("AZURE_SEARCH_INDEX_MAP")
+        index_map = tuple(
+            (prefix.strip(), name.strip())
+            for prefix, _, name in
+            (entry.partition(":") for entry in raw_map.split(",") if entry.strip())
+            if name.strip()
+        )
+
+        return cls(
+            endpoint=_get("AZURE_SEARCH_ENDPOINT"),
+            key=_get("AZURE_SEARCH_KEY"),
+            index_name=_get("AZURE_SEARCH_INDEX", "rag-index"),
+            index_map=index_map,
+            hnsw_m=int(_get("AZURE_SEARCH_HNSW_M", "16")),
+            hnsw_ef_construction=int(_get("AZURE_SEARCH_HNSW_EF_CONSTRUCTION", "200")),
+            hnsw_ef_search=int(_get("AZURE_SEARCH_HNSW_EF_SEARCH", "100")),
+        )
+
+    def index_for(self, source: str) -> str:
+        """Index that documents from this source belong to."""
+        for prefix, name in self.index_map:
+            if source.startswith(prefix):
+                return name
+        return self.index_name
+
+    def all_index_names(self) -> tuple[str, ...]:
+        """Default index plus every routed index, each listed once."""
+        names = [self.index_name]
+        for _, name in self.index_map:
+            if name not in names:
+                names.append(name)
+        return tuple(names)
+
+
+@dataclass(frozen=True, slots=True)
 class AzureStorageConfig:
     """
     Settings for Azure Blob Storage.
-    
+
     connection_string: Full connection string (contains account name + key)
     container_name: Name of the blob container where documents live
     """
-    connection_string: str = os.getenv("AZURE_STORAGE_CONNECTION_STRING", "")
-    container_name: str = os.getenv("AZURE_STORAGE_CONTAINER", "documents")
+    connection_string: str
+    container_name: str
+
+    @classmethod
+    def from_env(cls) -> "AzureStorageConfig":
+        return cls(
+            connection_string=_get("AZURE_STORAGE_CONNECTION_STRING"),
+            container_name=_get("AZURE_STORAGE_CONTAINER", "documents"),
+        )
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class AppConfig:
     """
     Master config that holds all sub-configs.
-    
+
     Usage:
         from src.config import config
         print(config.openai.endpoint)
         print(config.search.index_name)
     """
-    openai: AzureOpenAIConfig = None
-    search: AzureSearchConfig = None
-    storage: AzureStorageConfig = None
-    
+    openai: AzureOpenAIConfig
+    search: AzureSearchConfig
+    storage: AzureStorageConfig
+
+    # Computed once at construction — the configs are frozen, so the
+    # answer can never change afterwards. validate() used to rebuild
+    # this list on every pipeline instantiation.
+    _missing: tuple[str, ...] = field(init=False, repr=False)
+
     def __post_init__(self):
-        self.openai = AzureOpenAIConfig()
-        self.search = AzureSearchConfig()
-        self.storage = AzureStorageConfig()
-    
+        checks = [
+            ("AZURE_OPENAI_ENDPOINT", self.openai.endpoint),
+            ("AZURE_OPENAI_KEY", self.openai.key),
+            ("AZURE_SEARCH_ENDPOINT", self.search.endpoint),
+            ("AZURE_SEARCH_KEY", self.search.key),
+            ("AZURE_STORAGE_CONNECTION_STRING", self.storage.connection_string),
+        ]
+        # frozen dataclass: assignment must go through object.__setattr__
+        object.__setattr__(
+            self,
+            "_missing",
+            tuple(name for name, value in checks if not value),
+        )
+
     def validate(self) -> list[str]:
         """
         Check which credentials are missing.
         Returns list of missing items.
         """
-        missing = []
-        
-        if not self.openai.endpoint:
-            missing.append("AZURE_OPENAI_ENDPOINT")
-        if not self.openai.key:
-            missing.append("AZURE_OPENAI_KEY")
-        if not self.search.endpoint:
-            missing.append("AZURE_SEARCH_ENDPOINT")
-        if not self.search.key:
-            missing.append("AZURE_SEARCH_KEY")
-        if not self.storage.connection_string:
-            missing.append("AZURE_STORAGE_CONNECTION_STRING")
-        
-        return missing
-    
+        return list(self._missing)
+
     def print_status(self):
         """Print which services are configured."""
-        missing = self.validate()
-        
+        missing = self._missing
+
         if not missing:
             print("✅ All Azure credentials configured!")
         else:
@@ -122,9 +223,14 @@ class AppConfig:
             print("\n💡 Copy .env.example to .env and fill in your values")
 
 
-# Create a global config instance
+# Create a global config instance — the environment is read exactly
+# once, here, at import time.
 # Other files just do: from src.config import config
-config = AppConfig()
+config = AppConfig(
+    openai=AzureOpenAIConfig.from_env(),
+    search=AzureSearchConfig.from_env(),
+    storage=AzureStorageConfig.from_env(),
+)
 
 
 if __name__ == "__main__":
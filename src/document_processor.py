@@ -17,14 +17,85 @@ WHY CHUNK?
 CHUNKING STRATEGY:
 We use "recursive" chunking:
 1. Try to split on paragraphs (\\n\\n)
-2. If a paragraph is too big, split on sentences
+2. If a piece is still too big, fall through to line breaks,
+   then sentences, then words
 3. Each chunk overlaps slightly with the next one
    (so we don't cut a thought in half)
 """
 
+import functools
 import hashlib
-import re
+import logging
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Iterator, NamedTuple
+
+
+# Separators the recursive splitter tries, coarsest first:
+# paragraphs → lines → sentences → words
+_SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+# Ingest progress goes through logging, not print():
+# - print() takes the stdout lock and flushes per call — thousands of
+#   syscalls on a big ingest
+# - logging short-circuits below the configured level, so quiet runs
+#   skip even the message formatting
+# The pipeline configures the handler; `log.setLevel(logging.WARNING)`
+# silences per-file progress entirely.
+log = logging.getLogger(__name__)
+
+
+class Chunk(NamedTuple):
+    """
+    One processed chunk, ready for indexing.
+
+    A NamedTuple instead of a dict: every chunk used to carry its own
+    dict (~300 bytes of table + per-chunk key references) just to hold
+    five fields. A NamedTuple stores them in a plain tuple — several
+    times less overhead per chunk and faster to build, which adds up
+    on million-chunk ingests. Fields read the same way
+    (`chunk.content` instead of `chunk["content"]`).
+    """
+    id: str
+    content: str
+    source: str
+    page: int
+    chunk_index: int
+
+
+def _split(text: str, chunk_size: int, seps: tuple = _SEPARATORS) -> list[str]:
+    """
+    Recursively split text until every span fits in chunk_size.
+
+    Tries the coarsest separator first (paragraph breaks) and only
+    descends to finer ones (lines, sentences, words) for spans that
+    are still too long. Spans that already fit are never touched
+    again — unlike the old "split everything into paragraphs, then
+    re-split every long paragraph into sentences" passes, each byte
+    is scanned at most once per level it actually needs.
+    """
+    if len(text) <= chunk_size or not seps:
+        return [text]
+
+    sep, rest = seps[0], seps[1:]
+    parts = text.split(sep)
+
+    if len(parts) == 1:
+        # Separator not present — try the next, finer one
+        return _split(text, chunk_size, rest)
+
+    if sep == ". ":
+        # Splitting on ". " eats the period — put it back so
+        # sentence-sized chunks still read as sentences
+        parts = [p + "." for p in parts[:-1]] + parts[-1:]
+
+    out = []
+    for part in parts:
+        if len(part) <= chunk_size:
+            out.append(part)
+        else:
+            out.extend(_split(part, chunk_size, rest))
+    return out
 
 
 def load_text_file(path: str | Path) -> str:
@@ -33,52 +104,105 @@ def load_text_file(path: str | Path) -> str:
     return path.read_text(encoding="utf-8")
 
 
-def load_pdf(path: str | Path) -> list[dict]:
+def iter_pdf_pages(path: str | Path) -> Iterator[dict]:
     """
-    Load a PDF file, returning text per page.
-    
-    Returns:
-        List of dicts: [{"text": "...", "page": 1}, ...]
+    Load a PDF file, yielding text one page at a time.
+
+    A generator instead of a list: each page's text can be chunked
+    and garbage-collected before the next page is extracted, so peak
+    memory stays at one page even for multi-hundred-page PDFs.
+
+    Extraction prefers PyMuPDF (fitz) when installed — it's a
+    C-backed library roughly an order of magnitude faster per page
+    than pure-Python pypdf, which dominates large-PDF ingests.
+    pypdf remains the fallback so nothing extra is required.
+
+    Yields:
+        Dicts: {"text": "...", "page": 1}, ...
     """
+    try:
+        import fitz  # PyMuPDF — optional, much faster
+
+        doc = fitz.open(str(path))
+        try:
+            for i, page in enumerate(doc, start=1):
+                # Strip once: the stripped text is both the emptiness
+                # test and the stored value (the chunker re-strips
+                # paragraphs anyway, so nothing useful is lost)
+                text = page.get_text("text").strip()
+                if text:
+                    yield {"text": text, "page": i}
+        finally:
+            doc.close()
+        return
+    except ImportError:
+        pass
+
     from pypdf import PdfReader
-    
+
     reader = PdfReader(str(path))
-    pages = []
-    
+
     for i, page in enumerate(reader.pages, start=1):
-        text = page.extract_text() or ""
-        if text.strip():
-            pages.append({"text": text, "page": i})
-    
-    return pages
+        text = (page.extract_text() or "").strip()
+        if text:
+            yield {"text": text, "page": i}
+
+
+# XML namespace for WordprocessingML (the format inside .docx files)
+_DOCX_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
 
 
 def load_docx(path: str | Path) -> str:
-    """Load a DOCX file."""
-    from docx import Document
-    
-    doc = Document(str(path))
-    paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
+    """
+    Load a DOCX file.
+
+    A .docx is just a zip with the text in word/document.xml. Instead
+    of letting python-docx build a full in-memory object tree, we
+    stream the XML with lxml's iterparse, grab each paragraph's text,
+    and free the element immediately — much faster and flat memory on
+    large documents. Falls back to python-docx if lxml is missing.
+    """
+    import zipfile
+
+    try:
+        from lxml import etree
+    except ImportError:
+        # Fallback: python-docx (slower, loads the whole tree)
+        from docx import Document
+
+        doc = Document(str(path))
+        paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
+        return "\n\n".join(paragraphs)
+
+    paragraphs = []
+    with zipfile.ZipFile(path) as z, z.open("word/document.xml") as f:
+        for _, element in etree.iterparse(f, tag=f"{_DOCX_NS}p"):
+            text = "".join(element.itertext()).strip()
+            if text:
+                paragraphs.append(text)
+            element.clear()  # free the subtree as we go
+
     return "\n\n".join(paragraphs)
 
 
-def load_document(path: str | Path) -> list[dict]:
+def load_document(path: str | Path) -> list[dict] | Iterator[dict]:
     """
     Load any supported document.
-    
+
     Returns:
-        List of dicts with "text", "source", and "page" keys
+        List (or lazy iterator, for PDFs) of dicts with "text",
+        "source", and "page" keys
     """
     path = Path(path)
     suffix = path.suffix.lower()
-    
+
     if suffix == ".pdf":
-        pages = load_pdf(path)
-        return [
+        # Lazy: pages stream through the chunker one at a time
+        return (
             {"text": p["text"], "source": path.name, "page": p["page"]}
-            for p in pages
-        ]
-    
+            for p in iter_pdf_pages(path)
+        )
+
     elif suffix == ".docx":
         text = load_docx(path)
         return [{"text": text, "source": path.name, "page": 0}]
@@ -88,7 +212,7 @@ def load_document(path: str | Path) -> list[dict]:
         return [{"text": text, "source": path.name, "page": 0}]
     
     else:
-        print(f"⚠️ Unsupported file type: {suffix}")
+        log.warning("⚠️ Unsupported file type: %s", suffix)
         return []
 
 
@@ -99,12 +223,12 @@ def chunk_text(
 ) -> list[str]:
     """
     Split text into overlapping chunks.
-    
+
     Uses recursive strategy:
-    1. Split on paragraph breaks (\\n\\n)
-    2. If paragraphs are too long, split on sentences
-    3. Merge small chunks together until they hit the target size
-    
+    1. Split on paragraph breaks (\\n\\n), descending to line breaks,
+       sentences, then words only where a span is still too long
+    2. Merge small spans together until they hit the target size
+
     Args:
         text: The full text to chunk
         chunk_size: Target size in characters (not tokens)
@@ -121,44 +245,45 @@ def chunk_text(
     if not text or not text.strip():
         return []
     
-    # Step 1: Split into paragraphs
-    paragraphs = text.split("\n\n")
-    paragraphs = [p.strip() for p in paragraphs if p.strip()]
-    
-    # Step 2: Split long paragraphs into sentences
-    pieces = []
-    for para in paragraphs:
-        if len(para) > chunk_size:
-            # Split on sentence boundaries
-            sentences = re.split(r'(?<=[.!?])\s+', para)
-            pieces.extend(sentences)
-        else:
-            pieces.append(para)
-    
-    # Step 3: Merge small pieces into chunks of target size
+    # Step 1: One recursive descent produces all the right-sized
+    # spans directly. Each span is stripped exactly once, and the
+    # stripped value is both the filter test and the stored result.
+    pieces = [s for s in (p.strip() for p in _split(text, chunk_size)) if s]
+
+    # Step 2: Merge small pieces into chunks of target size.
+    # Pieces accumulate in a list and are joined once per emitted
+    # chunk — appending to a growing string instead would recopy the
+    # whole buffer on every piece (quadratic on long documents).
     chunks = []
-    current_chunk = ""
-    
+    buf: list[str] = []   # pieces of the chunk being built
+    buf_len = 0           # running length of "\n\n".join(buf)
+
     for piece in pieces:
         # If adding this piece would exceed chunk_size, save current chunk
-        if len(current_chunk) + len(piece) > chunk_size and current_chunk:
-            chunks.append(current_chunk.strip())
-            
+        if buf and buf_len + len(piece) > chunk_size:
+            chunk = "\n\n".join(buf).strip()
+            chunks.append(chunk)
+
             # Keep overlap from end of current chunk
             if chunk_overlap > 0:
-                current_chunk = current_chunk[-chunk_overlap:] + "\n\n" + piece
+                buf = [chunk[-chunk_overlap:], piece]
+                buf_len = min(chunk_overlap, len(chunk)) + 2 + len(piece)
             else:
-                current_chunk = piece
+                buf = [piece]
+                buf_len = len(piece)
         else:
-            if current_chunk:
-                current_chunk += "\n\n" + piece
+            if buf:
+                buf_len += 2 + len(piece)  # 2 for the "\n\n" separator
             else:
-                current_chunk = piece
-    
+                buf_len = len(piece)
+            buf.append(piece)
+
     # Don't forget the last chunk
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
-    
+    if buf:
+        chunk = "\n\n".join(buf).strip()
+        if chunk:
+            chunks.append(chunk)
+
     return chunks
 
 
@@ -166,95 +291,157 @@ def process_document(
     path: str | Path,
     chunk_size: int = 500,
     chunk_overlap: int = 50,
-) -> list[dict]:
+) -> list[Chunk]:
     """
     Complete document processing: load → chunk → prepare for indexing.
-    
+
     This is the main function you'll call.
-    
+
     Args:
         path: Path to the document
         chunk_size: Target chunk size in characters
         chunk_overlap: Overlap between chunks
-        
+
     Returns:
-        List of chunk dicts ready for index_documents()
-        
+        List of Chunk tuples ready for index_documents()
+
     Example:
         chunks = process_document("./docs/thesis.pdf")
         # [
-        #   {"id": "abc123_0", "content": "...", "source": "thesis.pdf", "page": 1, "chunk_index": 0},
-        #   {"id": "abc123_1", "content": "...", "source": "thesis.pdf", "page": 1, "chunk_index": 1},
+        #   Chunk(id="abc123...", content="...", source="thesis.pdf", page=1, chunk_index=0),
+        #   Chunk(id="def456...", content="...", source="thesis.pdf", page=1, chunk_index=1),
         #   ...
         # ]
     """
     path = Path(path)
-    print(f"📄 Processing: {path.name}")
+    log.info("📄 Processing: %s", path.name)
     
-    # Load document
+    # Load document (may be a lazy iterator — e.g. PDF pages stream
+    # through one at a time instead of all being held in memory)
     doc_parts = load_document(path)
-    
-    if not doc_parts:
-        print(f"  ⚠️ No text extracted from {path.name}")
-        return []
-    
+
     # Chunk each part
     all_chunks = []
     chunk_counter = 0
-    
+
     for part in doc_parts:
         text = part["text"]
         source = part["source"]
         page = part["page"]
         
         chunks = chunk_text(text, chunk_size, chunk_overlap)
-        
+
+        # The source/page part of the id is the same for every chunk
+        # of this part — encode it once outside the hot loop
+        id_prefix = f"{source}:{page}:".encode()
+
         for chunk_text_content in chunks:
-            # Create a unique ID using hash
-            hash_input = f"{source}:{page}:{chunk_counter}:{chunk_text_content[:100]}"
-            chunk_id = hashlib.md5(hash_input.encode()).hexdigest()[:16]
+            # Create a unique ID using hash — blake2b is faster than
+            # md5 per byte and produces the 16-hex-char id directly
+            # (digest_size=8) instead of slicing a longer hexdigest.
+            # Feeding the hash piecewise skips building an
+            # intermediate f-string per chunk.
+            # Only the first ~100 characters go into the hash, so only
+            # encode that much. With the default chunk_size the whole
+            # chunk often fits — then no slice copy happens at all.
+            if len(chunk_text_content) <= 100:
+                head = chunk_text_content
+            else:
+                head = chunk_text_content[:100]
+
+            h = hashlib.blake2b(digest_size=8)
+            h.update(id_prefix)
+            h.update(str(chunk_counter).encode())
+            h.update(b":")
+            h.update(head.encode("utf-8", "ignore"))
+            chunk_id = h.hexdigest()
             
-            all_chunks.append({
-                "id": chunk_id,
-                "content": chunk_text_content,
-                "source": source,
-                "page": page,
-                "chunk_index": chunk_counter,
-            })
+            all_chunks.append(Chunk(
+                id=chunk_id,
+                content=chunk_text_content,
+                source=source,
+                page=page,
+                chunk_index=chunk_counter,
+            ))
             chunk_counter += 1
-    
-    print(f"  ✅ Created {len(all_chunks)} chunks from {path.name}")
+
+    if not all_chunks:
+        log.warning("  ⚠️ No text extracted from %s", path.name)
+        return []
+
+    log.info("  ✅ Created %d chunks from %s", len(all_chunks), path.name)
     return all_chunks
 
 
-def process_directory(
+def iter_process_directory(
     directory: str | Path,
     chunk_size: int = 500,
     chunk_overlap: int = 50,
-) -> list[dict]:
+) -> Iterator[Chunk]:
     """
-    Process all supported documents in a directory.
-    
+    Process all supported documents in a directory, recursively and
+    lazily.
+
+    Yields chunks file-by-file instead of accumulating every chunk in
+    memory first. Callers can feed these straight into the indexer in
+    small batches, so memory stays flat no matter how big the corpus
+    is — and indexing overlaps with chunking of later files.
+
     Args:
         directory: Path to the directory
-        
-    Returns:
-        All chunks from all documents
+
+    Yields:
+        Chunk tuples, in the same order as the eager version
     """
     directory = Path(directory)
-    
+
     if not directory.is_dir():
         raise ValueError(f"Not a directory: {directory}")
-    
+
+    # Recursive walk, matching the blob-storage upload: nested files
+    # that get uploaded also get chunked and indexed
     supported = {".pdf", ".txt", ".md", ".markdown", ".docx"}
-    all_chunks = []
-    
-    for file_path in sorted(directory.iterdir()):
-        if file_path.suffix.lower() in supported:
-            chunks = process_document(file_path, chunk_size, chunk_overlap)
-            all_chunks.extend(chunks)
-    
-    print(f"\n📊 Total: {len(all_chunks)} chunks from {directory}")
+    paths = [
+        p for p in sorted(directory.rglob("*"))
+        if p.is_file() and p.suffix.lower() in supported
+    ]
+
+    if len(paths) <= 1:
+        # One file: a worker pool would just add startup overhead
+        for file_path in paths:
+            yield from process_document(file_path, chunk_size, chunk_overlap)
+    else:
+        # PDF/DOCX extraction + chunking + hashing is CPU-bound and
+        # independent per file — spread the files across cores.
+        # map() returns results in input order, so chunk order is
+        # the same as the serial version.
+        worker = functools.partial(
+            process_document,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+        )
+        with ProcessPoolExecutor() as executor:
+            for chunks in executor.map(worker, paths):
+                yield from chunks
+
+
+def process_directory(
+    directory: str | Path,
+    chunk_size: int = 500,
+    chunk_overlap: int = 50,
+) -> list[Chunk]:
+    """
+    Process all supported documents in a directory (eager version).
+
+    Args:
+        directory: Path to the directory
+
+    Returns:
+        All chunks from all documents
+    """
+    all_chunks = list(iter_process_directory(directory, chunk_size, chunk_overlap))
+
+    log.info("📊 Total: %d chunks from %s", len(all_chunks), directory)
     return all_chunks
 
 
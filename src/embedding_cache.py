@@ -0,0 +1,183 @@
+"""
+Embedding Cache Module.
+
+Embeddings are expensive: every text we embed costs an API call
+(latency + money). But embeddings are also deterministic — the same
+text with the same model always produces the same vector.
+
+So we cache them on disk. Re-running ingest on unchanged documents
+becomes a local database lookup instead of a network round-trip.
+
+SIMPLE ANALOGY:
+- First ingest = cooking a meal from scratch
+- Re-ingest with cache = reheating leftovers (same meal, seconds not hours)
+
+HOW IT WORKS:
+1. Each text is hashed together with the model name (blake2b)
+2. The hash → vector pair is stored in a local SQLite database
+3. Before calling Azure, we look up all hashes in one query
+4. Only cache MISSES go over the network; results are written back
+
+Vectors are stored quantized to int8 with a per-vector scale factor
+(~1.5 KB each instead of ~6 KB as float32) — a 4x saving in disk and
+memory bandwidth for a tiny, usually negligible precision loss.
+
+QUANTIZATION EXPLAINED:
+- Each float in the vector is mapped to an integer in [-127, 127]
+- scale = max(abs(vector)) / 127, so the largest value maps to ±127
+- To get the floats back: multiply the integers by scale
+- This is the same 8-bit scalar quantization used by vector databases
+  (e.g. FAISS IVF-SQ / HNSW-SQ) to cut memory traffic at search time
+"""
+
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+
+# Where the cache database lives (next to the ingested data)
+CACHE_PATH = Path("./data/embedding_cache.sqlite")
+
+# Shared connection, opened lazily on first use. Callers come from
+# many threads (upload workers, Streamlit's per-rerun script threads),
+# so the connection is opened with check_same_thread=False and every
+# use goes through _lock — sqlite3 connections are not safe for
+# concurrent use on their own.
+_conn: sqlite3.Connection | None = None
+_lock = threading.Lock()
+
+
+def _get_connection() -> sqlite3.Connection:
+    """Open (or create) the cache database, once per process.
+
+    Must be called with _lock held.
+    """
+    global _conn
+
+    if _conn is None:
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        _conn = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+
+        # Drop caches from before quantization (no 'scale' column) —
+        # they just get rebuilt on the next ingest.
+        columns = {
+            row[1]
+            for row in _conn.execute("PRAGMA table_info(embeddings)")
+        }
+        if columns and "scale" not in columns:
+            _conn.execute("DROP TABLE embeddings")
+
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "  hash  BLOB PRIMARY KEY,"
+            "  vec   BLOB NOT NULL,"   # int8 values
+            "  scale REAL NOT NULL"    # per-vector dequantization factor
+            ")"
+        )
+        _conn.commit()
+
+    return _conn
+
+
+def quantize(vec) -> tuple[bytes, float]:
+    """
+    Compress a float vector to int8 bytes + a scale factor.
+
+    Returns:
+        (int8 bytes, scale) — reconstruct with dequantize()
+    """
+    arr = np.asarray(vec, dtype=np.float32)
+
+    # Largest magnitude maps to ±127; all-zero vectors get scale 1.0
+    # to avoid dividing by zero.
+    scale = float(np.abs(arr).max()) / 127.0 or 1.0
+
+    i8 = np.clip(np.round(arr / scale), -127, 127).astype(np.int8)
+    return i8.tobytes(), scale
+
+
+def dequantize(blob: bytes, scale: float) -> np.ndarray:
+    """Reconstruct the float32 vector from int8 bytes + scale."""
+    i8 = np.frombuffer(blob, dtype=np.int8)
+    return i8.astype(np.float32) * scale
+
+
+def text_key(text: str, model: str) -> bytes:
+    """
+    Hash key for a (model, text) pair.
+
+    The model name is part of the key so switching embedding models
+    never serves stale vectors.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(model.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(text.encode("utf-8"))
+    return h.digest()
+
+
+def get_many(keys: list[bytes]) -> dict[bytes, np.ndarray]:
+    """
+    Look up many keys at once.
+
+    Returns a dict of key → float32 vector for the hits; misses are
+    simply absent. One batched SELECT instead of a query per text.
+    """
+    if not keys:
+        return {}
+
+    found: dict[bytes, np.ndarray] = {}
+
+    with _lock:
+        conn = _get_connection()
+
+        # SQLite caps the number of '?' placeholders per statement,
+        # so very large lookups go in slices.
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT hash, vec, scale FROM embeddings WHERE hash IN ({placeholders})",
+                chunk,
+            )
+            for key, blob, scale in rows:
+                found[key] = dequantize(blob, scale)
+
+    return found
+
+
+def put_many(items: dict[bytes, np.ndarray | list[float]]) -> None:
+    """Store many key → vector pairs (quantized) in one transaction."""
+    if not items:
+        return
+
+    rows = []
+    for key, vec in items.items():
+        blob, scale = quantize(vec)
+        rows.append((key, blob, scale))
+
+    with _lock:
+        conn = _get_connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (hash, vec, scale) VALUES (?, ?, ?)",
+            rows,
+        )
+        conn.commit()
+
+
+def clear() -> None:
+    """Wipe the cache (e.g. after changing chunking parameters)."""
+    with _lock:
+        conn = _get_connection()
+        conn.execute("DELETE FROM embeddings")
+        conn.commit()
+
+
+if __name__ == "__main__":
+    with _lock:
+        conn = _get_connection()
+        count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    print(f"📦 Embedding cache: {count} vectors in {CACHE_PATH}")
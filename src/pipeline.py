@@ -18,14 +18,88 @@ WHAT HAPPENS WHEN YOU CALL pipeline.query():
 That's the entire RAG flow. Everything else is just making each step better.
 """
 
+import functools
+import hashlib
+import logging
 from pathlib import Path
 from dataclasses import dataclass
 
 from src.config import config
-from src.blob_storage import upload_file, upload_directory, list_files
-from src.search_index import create_index, index_documents, search, get_index_stats
-from src.azure_openai import chat_completion, chat_completion_stream
-from src.document_processor import process_document, process_directory
+
+# Ingest progress from src.document_processor flows through logging
+# (cheaper than print on 10k-file ingests, and filterable). Configure
+# a plain handler once here; no-op if the app already configured one.
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+# NOTE: the heavy modules (azure-*, openai, pypdf) are imported inside
+# the methods that need them, not here. Importing this module — e.g.
+# "from src.pipeline import RAGPipeline" in a CLI — then costs
+# milliseconds instead of paying for the whole Azure SDK stack up
+# front, and code paths that never ingest never load pypdf at all.
+
+
+@functools.lru_cache(maxsize=256)
+def _cached_search(question: str, k: int) -> tuple:
+    """
+    Retrieval with an LRU cache on (question, k).
+
+    Repeat questions (demos, retries, several users asking the same
+    thing) skip the embedding round-trip and the search call entirely.
+    Results are stored as immutable tuples so cached entries can't be
+    mutated by callers; ingest() clears the cache so new documents
+    become visible.
+    """
+    from src.search_index import search
+
+    results = search(question, top_k=k)
+    return tuple(tuple(sorted(r.items())) for r in results)
+
+
+def _search_cached(question: str, k: int) -> list[dict]:
+    """Run retrieval through the cache, returning fresh dicts."""
+    return [dict(items) for items in _cached_search(question, k)]
+
+
+def _iter_deduped(chunk_iter):
+    """
+    Drop chunks whose content was already seen this ingest.
+
+    Keyed by a 16-byte content hash instead of the text itself, so
+    the seen-set stays small even on huge corpora. Lazy: chunks flow
+    through one at a time, preserving the streaming ingest path.
+    """
+    seen: set[bytes] = set()
+    skipped = 0
+
+    for chunk in chunk_iter:
+        key = hashlib.blake2b(
+            chunk.content.encode("utf-8", "ignore"),
+            digest_size=16,
+        ).digest()
+        if key in seen:
+            skipped += 1
+            continue
+        seen.add(key)
+        yield chunk
+
+    if skipped:
+        print(f"♻️ Skipped {skipped} duplicate chunks.")
+
+
+def _format_context(results: list[dict]) -> str:
+    """
+    Turn retrieved chunks into the context block for the prompt.
+
+    Shared by query() and query_stream() so the two paths can't drift
+    apart; a single generator feeding join() avoids the intermediate
+    parts list both used to build.
+    """
+    return "\n\n---\n\n".join(
+        f"[Source: {r['source']}"
+        + (f", Page {r['page']}" if r.get('page') else "")
+        + f"]\n{r['content']}"
+        for r in results
+    )
 
 
 @dataclass
@@ -76,13 +150,19 @@ class RAGPipeline:
         result.print_result()
     """
     
-    def __init__(self, top_k: int = 5):
+    def __init__(self, top_k: int = 5, max_tokens: int = 384):
         """
         Args:
             top_k: Number of document chunks to retrieve per query
+            max_tokens: Cap on generated answer length (generation
+                latency and cost scale linearly with tokens produced)
         """
         self.top_k = top_k
-        
+        self.max_tokens = max_tokens
+
+        # Sources retrieved by the most recent query_stream() call
+        self.last_sources: list[dict] = []
+
         # Validate config
         missing = config.validate()
         if missing:
@@ -98,6 +178,8 @@ class RAGPipeline:
         Run this once when you start the project.
         If the index already exists, it gets updated (not destroyed).
         """
+        from src.search_index import create_index
+
         print("🔧 Setting up search index...")
         create_index()
         print("✅ Setup complete!")
@@ -108,24 +190,37 @@ class RAGPipeline:
         upload_to_blob: bool = False,
         chunk_size: int = 500,
         chunk_overlap: int = 50,
+        dedupe: bool = True,
     ) -> int:
         """
         Ingest documents into the RAG system.
-        
+
         Steps:
         1. (Optional) Upload files to Azure Blob Storage
         2. Load and chunk the documents
         3. Compute embeddings and add to search index
-        
+
         Args:
             source: Path to file or directory
             upload_to_blob: Also upload to Azure Blob Storage?
             chunk_size: Characters per chunk
             chunk_overlap: Overlap between chunks
-            
+            dedupe: Skip chunks whose content is byte-identical to one
+                already seen this ingest. Real corpora repeat a lot of
+                boilerplate (headers, legal footers, copied sections),
+                and every duplicate chunk costs an embedding call and
+                index storage for zero retrieval value.
+
         Returns:
             Number of chunks indexed
         """
+        from src.blob_storage import upload_directory, upload_file
+        from src.document_processor import (
+            iter_process_directory,
+            process_document,
+        )
+        from src.search_index import index_documents
+
         source = Path(source)
         
         # Optionally upload to blob storage
@@ -136,21 +231,29 @@ class RAGPipeline:
             else:
                 upload_file(source)
         
-        # Process documents (load → chunk)
+        # Process documents (load → chunk), lazily for directories
         print("\n📄 Processing documents...")
         if source.is_dir():
-            chunks = process_directory(source, chunk_size, chunk_overlap)
+            chunk_iter = iter_process_directory(source, chunk_size, chunk_overlap)
         else:
-            chunks = process_document(source, chunk_size, chunk_overlap)
-        
-        if not chunks:
+            chunk_iter = iter(process_document(source, chunk_size, chunk_overlap))
+
+        # Index documents (embed → upload to search). The iterator
+        # flows straight into index_documents, which pulls windows of
+        # chunks as it goes — memory stays flat regardless of corpus
+        # size, and indexing overlaps with chunking of later files.
+        print("\n🔍 Indexing in Azure AI Search...")
+        if dedupe:
+            chunk_iter = _iter_deduped(chunk_iter)
+        count = index_documents(chunk_iter)
+
+        if count == 0:
             print("⚠️ No chunks created. Check your documents.")
             return 0
-        
-        # Index documents (embed → upload to search)
-        print("\n🔍 Indexing in Azure AI Search...")
-        count = index_documents(chunks)
-        
+
+        # New documents must show up in future queries
+        _cached_search.cache_clear()
+
         print(f"\n✅ Ingestion complete! {count} chunks indexed.")
         return count
     
@@ -171,11 +274,13 @@ class RAGPipeline:
         Returns:
             RAGResult with answer and sources
         """
+        from src.azure_openai import chat_completion
+
         k = top_k or self.top_k
         
-        # Step 1: Search
+        # Step 1: Search (repeat questions come from the cache)
         print(f"🔍 Searching for: {question[:50]}...")
-        results = search(question, top_k=k)
+        results = _search_cached(question, k)
         
         if not results:
             return RAGResult(
@@ -185,20 +290,11 @@ class RAGPipeline:
             )
         
         # Step 2: Format context
-        context_parts = []
-        for i, r in enumerate(results, 1):
-            source_info = f"[Source: {r['source']}"
-            if r.get('page'):
-                source_info += f", Page {r['page']}"
-            source_info += "]"
-            
-            context_parts.append(f"{source_info}\n{r['content']}")
-        
-        context = "\n\n---\n\n".join(context_parts)
+        context = _format_context(results)
         
         # Step 3: Generate answer
         print("🤖 Generating answer...")
-        answer = chat_completion(question, context)
+        answer = chat_completion(question, context, max_tokens=self.max_tokens)
         
         return RAGResult(
             question=question,
@@ -209,26 +305,28 @@ class RAGPipeline:
     def query_stream(self, question: str, top_k: int | None = None):
         """
         Same as query() but streams the answer token by token.
-        
+
+        Retrieval still runs synchronously first; the retrieved chunks
+        are saved on self.last_sources so UIs can show them alongside
+        the streaming answer.
+
         Yields:
             Individual tokens as they're generated
         """
+        from src.azure_openai import chat_completion_stream
+
         k = top_k or self.top_k
-        
-        results = search(question, top_k=k)
-        
+
+        results = _search_cached(question, k)
+        self.last_sources = results
+
         if not results:
             yield "I couldn't find any relevant information."
             return
         
-        context_parts = []
-        for r in results:
-            source_info = f"[Source: {r['source']}]"
-            context_parts.append(f"{source_info}\n{r['content']}")
-        
-        context = "\n\n---\n\n".join(context_parts)
-        
-        for token in chat_completion_stream(question, context):
+        context = _format_context(results)
+
+        for token in chat_completion_stream(question, context, max_tokens=self.max_tokens):
             yield token
     
     def search_only(self, query: str, top_k: int = 10) -> list[dict]:
@@ -237,10 +335,14 @@ class RAGPipeline:
         
         Useful for debugging: see what chunks the search returns.
         """
+        from src.search_index import search
+
         return search(query, top_k=top_k)
-    
+
     def stats(self) -> dict:
         """Get pipeline statistics."""
+        from src.search_index import get_index_stats
+
         index_stats = get_index_stats()
         
         return {
@@ -24,6 +24,16 @@ VECTOR SEARCH EXPLAINED:
 - "Closest numbers" = "Most similar meaning"
 """
 
+import asyncio
+import functools
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+from typing import Iterable
+
+import numpy as np
 from azure.search.documents import SearchClient
 from azure.search.documents.indexes import SearchIndexClient
 from azure.search.documents.indexes.models import (
@@ -34,6 +44,9 @@ from azure.search.documents.indexes.models import (
     SearchableField,
     VectorSearch,
     HnswAlgorithmConfiguration,
+    HnswParameters,
+    VectorSearchAlgorithmMetric,
+    ScalarQuantizationCompression,
     VectorSearchProfile,
     SearchIndex,
     SemanticConfiguration,
@@ -43,38 +56,91 @@ from azure.search.documents.indexes.models import (
 )
 from azure.search.documents.models import VectorizedQuery
 from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import ResourceNotFoundError
 
 from src.config import config
 from src.azure_openai import get_embedding, get_embeddings_batch
+from src.document_processor import Chunk
 
 
+@functools.lru_cache(maxsize=1)
 def get_index_client() -> SearchIndexClient:
     """
     Client for MANAGING indexes (create, delete, list).
-    
+
     Think of this as the library administrator who sets up
-    the cataloging system.
+    the cataloging system. Cached: building a client sets up a whole
+    HTTP pipeline (policies, TLS connection pool), and reusing it
+    keeps connections warm across calls.
     """
     return SearchIndexClient(
         endpoint=config.search.endpoint,
         credential=AzureKeyCredential(config.search.key),
+        retry_total=6,
+        retry_backoff_max=64,
     )
 
 
-def get_search_client() -> SearchClient:
+@functools.lru_cache(maxsize=None)
+def get_search_client(index_name: str | None = None) -> SearchClient:
     """
     Client for SEARCHING within an index.
-    
+
     Think of this as the librarian who helps you find books.
+    Defaults to the main index; pass index_name when routing to one
+    of the per-source indexes from AZURE_SEARCH_INDEX_MAP.
+
+    Cached per index name: every search and upload used to build a
+    fresh client — a new HTTP pipeline and TLS pool, costing tens of
+    milliseconds of handshake on first use. The cached clients are
+    thread-safe and keep their connections alive between calls.
     """
     return SearchClient(
         endpoint=config.search.endpoint,
-        index_name=config.search.index_name,
+        index_name=index_name or config.search.index_name,
         credential=AzureKeyCredential(config.search.key),
+        # azure-core's retry policy: up to 6 attempts, exponential
+        # backoff capped at 64 s, Retry-After headers honored — a
+        # throttled upload batch retries instead of failing the whole
+        # indexing job
+        retry_total=6,
+        retry_backoff_max=64,
     )
 
 
-def create_index():
+def _index_signature(index: SearchIndex) -> tuple:
+    """
+    Reduced fingerprint of an index schema: field names/types/vector
+    dimensions plus the HNSW parameters. Two indexes with equal
+    signatures need no update — comparing these instead of the full
+    serialized definition ignores server-populated noise (etags,
+    defaults) that would make every comparison look different.
+    """
+    fields = tuple(sorted(
+        (f.name, str(f.type), getattr(f, "vector_search_dimensions", None) or 0)
+        for f in index.fields
+    ))
+
+    hnsw: tuple = ()
+    if index.vector_search and index.vector_search.algorithms:
+        params = index.vector_search.algorithms[0].parameters
+        if params:
+            # The service returns the metric as a plain string while
+            # locally-built indexes carry the enum — compare the
+            # underlying value so the two sides actually match
+            metric = getattr(params.metric, "value", params.metric)
+            hnsw = (params.m, params.ef_construction, params.ef_search, metric)
+
+    return (fields, hnsw)
+
+
+# Signatures of indexes this process has already verified or created —
+# repeat create_index() calls (e.g. per-request setup in serverless
+# deployments) then skip even the GET round-trip
+_known_signatures: dict[str, tuple] = {}
+
+
+def create_index(index_name: str | None = None):
     """
     Create the search index with vector search support.
     
@@ -90,6 +156,15 @@ def create_index():
     - SearchableField: Can be searched with keywords (like ctrl+F)
     - SimpleField: Stored but not searched (like metadata)
     - Vector field: Searched by meaning (embedding similarity)
+
+    With AZURE_SEARCH_INDEX_MAP configured, every routed index is
+    created too (same schema): several small HNSW graphs are cheaper
+    to traverse than one big one, and they can be searched in
+    parallel.
+
+    Args:
+        index_name: Create just this index (default: the main index
+            plus every index in the routing map)
     """
     index_client = get_index_client()
     
@@ -133,13 +208,15 @@ def create_index():
             filterable=True,
         ),
         
-        # The embedding vector (1536 numbers)
+        # The embedding vector
         SearchField(
             name="content_vector",
             type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
             searchable=True,
             # Vector search configuration:
-            vector_search_dimensions=1536,  # text-embedding-3-small outputs 1536 dims
+            # Dimension follows config — text-embedding-3 models can be
+            # truncated (e.g. 512) for a 3x smaller, faster index
+            vector_search_dimensions=config.openai.embedding_dim,
             vector_search_profile_name="my-vector-profile",
         ),
     ]
@@ -152,16 +229,44 @@ def create_index():
         algorithms=[
             HnswAlgorithmConfiguration(
                 name="my-hnsw-config",
-                # These are sensible defaults:
-                # m=4: each node connects to 4 neighbors
-                # efConstruction=400: thoroughness when building the index
-                # efSearch=500: thoroughness when searching
+                # Explicit parameters instead of service defaults
+                # (tunable via AZURE_SEARCH_HNSW_* env vars):
+                # - m=16: more neighbors per node than the default 4
+                #   — noticeably better recall for a modest index-size
+                #   increase
+                # - ef_search=100 (default 500): query latency scales
+                #   with this, and for OpenAI embeddings recall is
+                #   already near-saturated at 100 — ~5x fewer distance
+                #   evaluations per query
+                # - ef_construction=200 (default 400): build cost per
+                #   inserted vector scales linearly with this, and
+                #   recall saturates well before 400 for these
+                #   embeddings — re-indexing runs about twice as fast
+                # Dot product, not cosine: embeddings are already
+                # L2-normalized in src.azure_openai, so dot product
+                # gives identical rankings while skipping the
+                # sqrt/divide cosine pays per distance evaluation
+                parameters=HnswParameters(
+                    m=config.search.hnsw_m,
+                    ef_construction=config.search.hnsw_ef_construction,
+                    ef_search=config.search.hnsw_ef_search,
+                    metric=VectorSearchAlgorithmMetric.DOT_PRODUCT,
+                ),
             ),
         ],
+        # Scalar quantization: the service stores each vector
+        # component as int8 instead of float32 — 4x less index
+        # storage and faster distance math, applied server-side.
+        # We still upload plain float lists; rescoring against the
+        # original vectors keeps the recall loss negligible.
+        compressions=[
+            ScalarQuantizationCompression(compression_name="my-sq"),
+        ],
         profiles=[
             VectorSearchProfile(
                 name="my-vector-profile",
                 algorithm_configuration_name="my-hnsw-config",
+                compression_name="my-sq",
             ),
         ],
     )
@@ -179,159 +284,379 @@ def create_index():
     
     semantic_search = SemanticSearch(configurations=[semantic_config])
     
-    # ---- Create the index ----
-    index = SearchIndex(
-        name=config.search.index_name,
-        fields=fields,
-        vector_search=vector_search,
-        semantic_search=semantic_search,
-    )
-    
-    # Create or update the index
-    result = index_client.create_or_update_index(index)
-    print(f"✅ Index '{result.name}' created/updated successfully!")
+    # ---- Create the index(es) ----
+    names = (index_name,) if index_name else config.search.all_index_names()
+
+    result = None
+    for name in names:
+        index = SearchIndex(
+            name=name,
+            fields=fields,
+            vector_search=vector_search,
+            semantic_search=semantic_search,
+        )
+
+        # Skip the PUT when the schema hasn't changed: startup calls
+        # against an already-correct index then cost one GET (or, on
+        # repeat calls in this process, nothing at all)
+        signature = _index_signature(index)
+        if _known_signatures.get(name) == signature:
+            continue
+        try:
+            existing = index_client.get_index(name)
+            if _index_signature(existing) == signature:
+                _known_signatures[name] = signature
+                print(f"⏭️ Index '{name}' unchanged, skipping update")
+                result = existing
+                continue
+        except ResourceNotFoundError:
+            pass  # New index — create it
+
+        # Create or update the index
+        result = index_client.create_or_update_index(index)
+        _known_signatures[name] = signature
+        print(f"✅ Index '{result.name}' created/updated successfully!")
+
     return result
 
 
 def delete_index():
-    """Delete the index (removes all data!)."""
+    """Delete the index (and any routed indexes) — removes all data!"""
     index_client = get_index_client()
-    index_client.delete_index(config.search.index_name)
-    print(f"🗑️ Index '{config.search.index_name}' deleted")
+    for name in config.search.all_index_names():
+        index_client.delete_index(name)
+        print(f"🗑️ Index '{name}' deleted")
 
 
-def index_documents(chunks: list[dict]) -> int:
+def index_documents(chunks: Iterable[Chunk | dict]) -> int:
     """
     Add document chunks to the search index.
-    
+
     Each chunk needs:
     - id: Unique identifier
     - content: The text
     - source: Where it came from
     - page: Page number (0 if not applicable)
     - chunk_index: Position in document
-    
-    This function also computes embeddings for each chunk.
-    
+
+    This function also computes embeddings for each chunk. Chunks
+    with identical content are embedded only once: the embedding
+    layer dedupes texts by hash before calling the API and scatters
+    the shared vector back to every occurrence, so boilerplate
+    repeated across documents never costs extra API calls.
+
+    Accepts any iterable — including a lazy generator straight from
+    the document processor. Chunks are pulled in windows of 1000 and
+    at most a few windows are in flight at once, so peak memory is
+    bounded regardless of corpus size: corpora that don't fit in RAM
+    index fine.
+
     Args:
-        chunks: List of dicts with the above fields
-        
+        chunks: Iterable of Chunk tuples (what the document processor
+            produces) or dicts with the above fields
+
     Returns:
         Number of chunks indexed
-        
+
     Example:
-        chunks = [
-            {"id": "doc1_chunk0", "content": "ML is AI...", "source": "ml.pdf", "page": 1, "chunk_index": 0},
-            {"id": "doc1_chunk1", "content": "Deep learning...", "source": "ml.pdf", "page": 1, "chunk_index": 1},
-        ]
+        chunks = process_document("./docs/ml.pdf")
         index_documents(chunks)
     """
-    if not chunks:
+    iterator = iter(chunks)
+
+    def upload_one(client: SearchClient, batch: list[dict]) -> int:
+        # Small random delay so parallel workers don't all hit the
+        # service in the same instant (503 thundering-herd)
+        time.sleep(random.uniform(0, 0.05))
+        result = client.upload_documents(documents=batch)
+        return sum(1 for r in result if r.succeeded)
+
+    # Embed and upload in shards of 1000, producer/consumer style:
+    # the main thread embeds shard N+1 while the pool uploads shard N,
+    # so embedding round-trips overlap upload round-trips instead of
+    # the two network stages running back to back. A shard is also
+    # the natural upload unit (documents per upload call).
+    shard_size = 1000
+    total_pulled = 0
+    total_uploaded = 0
+    futures = []
+
+    # At most this many uploads queued or running at once (2x the
+    # worker count). Without a cap, a fast producer — e.g. a re-ingest
+    # where every embedding is a cache hit — piles up pending shards
+    # faster than 4 workers can drain them, and "peak memory is one
+    # window" quietly stops being true.
+    max_in_flight = 8
+
+    print("🧮 Embedding + uploading chunks...")
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        while True:
+            shard = list(islice(iterator, shard_size))
+            if not shard:
+                break
+            total_pulled += len(shard)
+
+            # Hand-built dicts still work: normalize them to the
+            # lightweight Chunk tuple the document processor emits
+            shard = [
+                c if isinstance(c, Chunk) else Chunk(
+                    id=c["id"],
+                    content=c["content"],
+                    source=c.get("source", "unknown"),
+                    page=c.get("page", 0),
+                    chunk_index=c.get("chunk_index", 0),
+                )
+                for c in shard
+            ]
+
+            # Step 1: Compute embeddings for this shard
+            embeddings = get_embeddings_batch([c.content for c in shard])
+
+            # Step 2: Attach embeddings. The shard's vectors live in
+            # one contiguous float32 matrix, and one C-level tolist()
+            # call on the matrix converts them all for the JSON
+            # payload — instead of a Python-level tolist() per row.
+            # The doc dicts themselves exist only for this shard.
+            vec_lists = np.stack(embeddings).tolist()
+            documents = [
+                {
+                    "id": chunk.id,
+                    "content": chunk.content,
+                    "source": chunk.source,
+                    "page": chunk.page,
+                    "chunk_index": chunk.chunk_index,
+                    "content_vector": vec,
+                }
+                for chunk, vec in zip(shard, vec_lists)
+            ]
+
+            # Step 3: Route each document to its index (everything
+            # goes to the default index unless AZURE_SEARCH_INDEX_MAP
+            # is set), then hand the slices to the upload pool and
+            # keep going
+            by_index: dict[str, list[dict]] = {}
+            for chunk, doc in zip(shard, documents):
+                name = config.search.index_for(chunk.source)
+                by_index.setdefault(name, []).append(doc)
+
+            for name, docs in by_index.items():
+                # Back-pressure: once the in-flight cap is reached,
+                # wait for the oldest upload before queuing another,
+                # so the producer can't outrun the pool
+                while len(futures) >= max_in_flight:
+                    total_uploaded += futures.pop(0).result()
+                futures.append(
+                    pool.submit(upload_one, get_search_client(name), docs)
+                )
+
+        for future in as_completed(futures):
+            total_uploaded += future.result()
+
+    if total_pulled == 0:
         print("⚠️ No chunks to index")
         return 0
-    
-    search_client = get_search_client()
-    
-    # Step 1: Compute embeddings for all chunks
-    print(f"🧮 Computing embeddings for {len(chunks)} chunks...")
-    texts = [c["content"] for c in chunks]
-    embeddings = get_embeddings_batch(texts)
-    
-    # Step 2: Add embeddings to each chunk
-    documents = []
-    for chunk, embedding in zip(chunks, embeddings):
-        doc = {
-            "id": chunk["id"],
-            "content": chunk["content"],
-            "source": chunk.get("source", "unknown"),
-            "page": chunk.get("page", 0),
-            "chunk_index": chunk.get("chunk_index", 0),
-            "content_vector": embedding,  # The 1536-number vector
-        }
-        documents.append(doc)
-    
-    # Step 3: Upload to Azure AI Search (in batches of 1000)
-    print(f"📤 Uploading {len(documents)} documents to index...")
-    
-    batch_size = 1000
-    total_uploaded = 0
-    
-    for i in range(0, len(documents), batch_size):
-        batch = documents[i:i + batch_size]
-        result = search_client.upload_documents(documents=batch)
-        
-        # Count successes
-        succeeded = sum(1 for r in result if r.succeeded)
-        total_uploaded += succeeded
-    
-    print(f"✅ Indexed {total_uploaded}/{len(documents)} chunks successfully!")
+
+    print(f"✅ Indexed {total_uploaded}/{total_pulled} chunks successfully!")
     return total_uploaded
 
 
+# Identifier-like tokens (model names, error codes, acronyms —
+# "GPT-4o", "E1234", "HNSW", "snake_case") that keyword search matches
+# exactly but embeddings often blur. Ordinary title-case words — the
+# "What"/"Explain" that starts most questions — deliberately do NOT
+# match, so natural-language queries stay on the vector-only path.
+_KEYWORD_RE = re.compile(
+    r"\w*\d\w*"           # contains a digit: GPT-4, E1234, utf8
+    r"|\b[A-Z]{2,}\b"     # ALL-CAPS acronym: HNSW, RAG, API
+    r"|\b\w+_\w+\b"       # underscore compound: content_vector
+    r"|\b[a-z]+[A-Z]\w*"  # mixed case: camelCase, efSearch
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def _query_embedding(query: str) -> tuple:
+    """
+    Embedding for a search query, cached in-process.
+
+    Repeated queries (UI reruns, tests, several users asking the same
+    thing) skip even the disk-cache lookup — a hit returns in
+    microseconds. Stored as an immutable tuple so cached entries
+    can't be mutated; convert with list() at the call site.
+    """
+    return tuple(get_embedding(query).tolist())
+
+
 def search(
     query: str,
     top_k: int = 5,
     source_filter: str | None = None,
+    mode: str = "auto",
 ) -> list[dict]:
     """
-    Search for relevant document chunks using HYBRID search.
-    
-    HYBRID = keyword search + vector search combined.
-    
-    Why hybrid?
-    - Keyword search finds exact matches: "GPT-4" matches "GPT-4"
-    - Vector search finds meaning: "car" matches "automobile"
-    - Together = best of both worlds
-    
+    Search for relevant document chunks.
+
+    Modes:
+    - "vector": meaning-only search ("car" matches "automobile")
+    - "hybrid": keyword + vector combined ("GPT-4" matches "GPT-4"
+      exactly AND similar meanings) — twice the server-side work
+    - "auto" (default): vector-only, upgraded to hybrid when the
+      query contains identifier-like tokens (codes, model names,
+      acronyms) that keyword search handles better. Natural-language
+      questions — the common case — then skip the keyword half
+      entirely.
+
     Args:
         query: The question or search query
         top_k: How many results to return
         source_filter: Only search in a specific document (optional)
-        
+        mode: "auto", "hybrid", or "vector"
+
     Returns:
         List of dicts with content, source, score
     """
-    search_client = get_search_client()
-    
-    # Step 1: Convert query to embedding (for vector search)
-    query_embedding = get_embedding(query)
-    
-    # Step 2: Create vector query
+    if mode == "auto":
+        mode = "hybrid" if _KEYWORD_RE.search(query) else "vector"
+    search_text = query if mode == "hybrid" else None
+    # Step 1: Convert query to embedding (cached for repeat queries)
+    # Step 2: Create vector query (tuple → JSON list)
     vector_query = VectorizedQuery(
-        vector=query_embedding,
+        vector=list(_query_embedding(query)),
         k_nearest_neighbors=top_k,
         fields="content_vector",
     )
-    
-    # Step 3: Build filter (optional)
+
+    # Step 3: Build filter (optional) and pick the target indexes.
+    # A source filter pins the query to that source's index; with a
+    # routing map and no filter, every index is searched in parallel
+    # and the results merge by score.
     filter_expr = None
     if source_filter:
         filter_expr = f"source eq '{source_filter}'"
-    
-    # Step 4: Execute hybrid search
-    # search_text = keyword search
+        index_names = [config.search.index_for(source_filter)]
+    else:
+        index_names = list(config.search.all_index_names())
+
+    # Step 4: Execute the search
+    # search_text = keyword search (None in vector-only mode)
     # vector_queries = vector search
-    # Both run simultaneously, results are combined
-    results = search_client.search(
-        search_text=query,              # Keyword search
-        vector_queries=[vector_query],   # Vector search
-        top=top_k,
-        filter=filter_expr,
-        select=["id", "content", "source", "page", "chunk_index"],
+    # When both are set they run simultaneously, results are combined
+    def search_one(index_name: str) -> list[dict]:
+        results = get_search_client(index_name).search(
+            search_text=search_text,         # Keyword search (or None)
+            vector_queries=[vector_query],   # Vector search
+            top=top_k,
+            filter=filter_expr,
+            select=["id", "content", "source", "page", "chunk_index"],
+        )
+
+        # Step 5: Format results. Drain the lazy SearchItemPaged into
+        # a plain list first — every access on the paged object goes
+        # through the SDK's page-fetching machinery, and with top_k
+        # above the page size that can mean hidden extra round-trips
+        # mid-loop. One comprehension then builds the result dicts.
+        items = list(results)
+        return [
+            {
+                "id": r["id"],
+                "content": r["content"],
+                "source": r["source"],
+                "page": r.get("page", 0),
+                "score": r["@search.score"],
+            }
+            for r in items
+        ]
+
+    if len(index_names) == 1:
+        return search_one(index_names[0])
+
+    # Fan out: each per-source index is small, so the queries are
+    # individually fast and run concurrently
+    with ThreadPoolExecutor(max_workers=len(index_names)) as pool:
+        merged = [r for batch in pool.map(search_one, index_names) for r in batch]
+
+    merged.sort(key=lambda r: r["score"], reverse=True)
+    return merged[:top_k]
+
+
+@functools.lru_cache(maxsize=None)
+def get_async_search_client(index_name: str | None = None):
+    """
+    Async twin of get_search_client, for event-loop callers.
+
+    Imported lazily so the aio transport (and its event-loop
+    machinery) is only loaded by code that actually goes async.
+    """
+    from azure.search.documents.aio import SearchClient as AsyncSearchClient
+
+    return AsyncSearchClient(
+        endpoint=config.search.endpoint,
+        index_name=index_name or config.search.index_name,
+        credential=AzureKeyCredential(config.search.key),
+        retry_total=6,
+        retry_backoff_max=64,
     )
-    
-    # Step 5: Format results
-    search_results = []
-    for result in results:
-        search_results.append({
-            "id": result["id"],
-            "content": result["content"],
-            "source": result["source"],
-            "page": result.get("page", 0),
-            "score": result["@search.score"],
-        })
-    
-    return search_results
+
+
+async def search_async(
+    query: str,
+    top_k: int = 5,
+    source_filter: str | None = None,
+    mode: str = "auto",
+) -> list[dict]:
+    """
+    Async version of search(), same arguments and results.
+
+    Use this when serving many questions concurrently: each query
+    awaits its network calls instead of parking a thread, so
+    hundreds of in-flight searches share one event loop. Multi-index
+    fan-out runs through asyncio.gather rather than a thread pool.
+    """
+    from src.azure_openai import get_embedding_async
+
+    if mode == "auto":
+        mode = "hybrid" if _KEYWORD_RE.search(query) else "vector"
+    search_text = query if mode == "hybrid" else None
+
+    query_vec = await get_embedding_async(query)
+    vector_query = VectorizedQuery(
+        vector=query_vec.tolist(),
+        k_nearest_neighbors=top_k,
+        fields="content_vector",
+    )
+
+    filter_expr = None
+    if source_filter:
+        filter_expr = f"source eq '{source_filter}'"
+        index_names = [config.search.index_for(source_filter)]
+    else:
+        index_names = list(config.search.all_index_names())
+
+    async def search_one(index_name: str) -> list[dict]:
+        results = await get_async_search_client(index_name).search(
+            search_text=search_text,
+            vector_queries=[vector_query],
+            top=top_k,
+            filter=filter_expr,
+            select=["id", "content", "source", "page", "chunk_index"],
+        )
+        return [
+            {
+                "id": r["id"],
+                "content": r["content"],
+                "source": r["source"],
+                "page": r.get("page", 0),
+                "score": r["@search.score"],
+            }
+            async for r in results
+        ]
+
+    if len(index_names) == 1:
+        return await search_one(index_names[0])
+
+    batches = await asyncio.gather(*(search_one(n) for n in index_names))
+    merged = [r for batch in batches for r in batch]
+    merged.sort(key=lambda r: r["score"], reverse=True)
+    return merged[:top_k]
 
 
 def vector_search_only(query: str, top_k: int = 5) -> list[dict]:
@@ -342,11 +667,9 @@ def vector_search_only(query: str, top_k: int = 5) -> list[dict]:
     Good for questions that use very different words than the documents.
     """
     search_client = get_search_client()
-    
-    query_embedding = get_embedding(query)
-    
+
     vector_query = VectorizedQuery(
-        vector=query_embedding,
+        vector=list(_query_embedding(query)),
         k_nearest_neighbors=top_k,
         fields="content_vector",
     )
@@ -358,6 +681,7 @@ def vector_search_only(query: str, top_k: int = 5) -> list[dict]:
         select=["id", "content", "source", "page"],
     )
     
+    items = list(results)
     return [
         {
             "id": r["id"],
@@ -366,7 +690,7 @@ def vector_search_only(query: str, top_k: int = 5) -> list[dict]:
             "page": r.get("page", 0),
             "score": r["@search.score"],
         }
-        for r in results
+        for r in items
     ]
 
 